@@ -1,105 +1,465 @@
+import httpx
 import ollama
 import fitz  # PyMuPDF
 from PIL import Image
+import numpy as np
+import pybase64
 import io
-import base64
+import os
 import argparse
+import hashlib
+import json
+import multiprocessing
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
 from difflib import SequenceMatcher
+from functools import partial
+from itertools import islice
 
+JPEG_QUALITY = 85
 
-def pdf_to_images(pdf_path, num_splits=None, overlap_ratio=0.1):
-    """Convert PDF pages to PIL Images with optional splitting
+# Longest side of each image sent to the model in pixels. Qwen2.5-VL downscales
+# larger images anyway, so rendering beyond this only costs encode time and
+# bandwidth.
+TARGET_TILE_SIZE = 1400
+
+# libjpeg-turbo is optional; tiles fall back to Pillow's JPEG encoder without it
+try:
+    from turbojpeg import TJPF_RGB, TurboJPEG
+
+    _turbojpeg = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    _turbojpeg = None
+
+
+def encode_jpeg(pixels):
+    """Encode an RGB height x width x 3 array as JPEG bytes"""
+    if _turbojpeg is not None:
+        return _turbojpeg.encode(pixels, quality=JPEG_QUALITY, pixel_format=TJPF_RGB)
+
+    buffered = io.BytesIO()
+    Image.fromarray(pixels).save(buffered, format="JPEG", quality=JPEG_QUALITY)
+    return buffered.getvalue()
+
+
+def release_page_memory():
+    """Shrink MuPDF's object store so rendered pages don't pile up in memory"""
+    fitz.TOOLS.store_shrink(100)
+
+
+# Document opened once per render worker process, see init_render_worker
+_worker_doc = None
+
+
+def init_render_worker(pdf_path):
+    """Open the PDF once in each render worker process"""
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+
+def has_text_layer(text, min_chars=50, min_alnum_ratio=0.5):
+    """Whether text extracted from a PDF's text layer looks usable
+
+    Scanned pages usually have no text layer, and broken font encodings give
+    text that is mostly symbols, so both fall back to the model.
+    """
+    chars = "".join(text.split())
+    if len(chars) < min_chars:
+        return False
+
+    return sum(char.isalnum() for char in chars) / len(chars) > min_alnum_ratio
+
+
+def render_page(
+    page_num,
+    num_splits=None,
+    overlap_ratio=0.1,
+    target_size=TARGET_TILE_SIZE,
+    use_text_layer=True,
+):
+    """Turn a single page of the worker's PDF into extraction jobs
+
+    Returns a single ("text", page_num, text) job when the page already has a
+    usable text layer, otherwise one ("image", page_num, jpeg_bytes) job per tile.
+    """
+    page = _worker_doc[page_num]
+
+    if use_text_layer:
+        text = page.get_text("text")
+        if has_text_layer(text):
+            page = None
+            release_page_memory()
+            return [("text", page_num, text)]
+
+    # Each tile is sent on its own, so scale until the longest side of a tile,
+    # not of the whole page, is target_size pixels
+    splits = max(num_splits or 1, 1)
+    scale = target_size / max(page.rect.width, page.rect.height / splits)
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+
+    if not num_splits or num_splits <= 1:
+        # Unsplit pages go straight from the pixmap to JPEG bytes, no PIL or numpy
+        tile = pix.tobytes("jpg", jpg_quality=JPEG_QUALITY)
+        pix = page = None
+        release_page_memory()
+        return [("image", page_num, tile)]
+
+    # View the pixmap samples as a height x width x channels array without copying
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(
+        pix.height, pix.width, pix.n
+    )
+    height = pix.height
+
+    # Calculate split height based on number of splits
+    split_height = height // num_splits
+    overlap_pixels = int(split_height * overlap_ratio)
+
+    tiles = []
+    for i in range(num_splits):
+        # Calculate start and end positions
+        y_start = max(0, i * split_height - (overlap_pixels if i > 0 else 0))
+        y_end = min(
+            (i + 1) * split_height + (overlap_pixels if i < num_splits - 1 else 0),
+            height,
+        )
+
+        # For the last split, extend to the bottom of the image
+        if i == num_splits - 1:
+            y_end = height
+
+        # Slicing rows of the samples is a view, so only the JPEG encode copies
+        tiles.append(("image", page_num, encode_jpeg(samples[y_start:y_end])))
+
+    # Drop every reference to the pixmap before shrinking the store
+    samples = pix = page = None
+    release_page_memory()
+
+    return tiles
+
+
+def pdf_to_jobs(
+    pdf_path,
+    num_splits=None,
+    overlap_ratio=0.1,
+    workers=None,
+    target_size=TARGET_TILE_SIZE,
+    use_text_layer=True,
+    page_count=None,
+):
+    """Yield extraction jobs for PDF pages in page order
+
+    Pages with a usable text layer yield a single ("text", page_num, text) job
+    and are never rendered. Other pages yield ("image", page_num, jpeg_bytes)
+    jobs, one per split.
+
+    Pages are rendered in a pool of worker processes, each holding its own
+    open document since PyMuPDF is not safe to use from multiple threads.
+    Only a few pages per worker are rendered ahead of the consumer, so memory
+    does not grow with the page count.
 
     Args:
         pdf_path: Path to the PDF file
         num_splits: Number of parts to split each page into. If None, no splitting occurs
         overlap_ratio: Ratio of overlap between splits (0.0 to 1.0)
+        workers: Number of render processes. Defaults to the number of CPUs
+        target_size: Longest side of each rendered tile in pixels
+        use_text_layer: Use the PDF's own text for pages that have a usable
+            text layer instead of rendering them for the model
+        page_count: Number of pages in the PDF, if the caller already knows it
     """
-    doc = fitz.open(pdf_path)
-    images = []
-
-    for page_num in range(doc.page_count):
-        page = doc[page_num]
-        # Higher DPI for better text recognition
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img_data = pix.tobytes("png")
-        image = Image.open(io.BytesIO(img_data))
-
-        if num_splits and num_splits > 1:
-            # Calculate split height based on number of splits
-            split_height = image.height // num_splits
-            overlap_pixels = int(split_height * overlap_ratio)
-
-            for i in range(num_splits):
-                # Calculate start and end positions
-                y_start = max(0, i * split_height - (overlap_pixels if i > 0 else 0))
-                y_end = min(
-                    (i + 1) * split_height
-                    + (overlap_pixels if i < num_splits - 1 else 0),
-                    image.height,
-                )
+    if page_count is None:
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+    if page_count == 0:
+        return
+
+    # Every worker opens the document, so never start more than there are pages
+    workers = min(workers or os.cpu_count(), page_count)
+    render = partial(
+        render_page,
+        num_splits=num_splits,
+        overlap_ratio=overlap_ratio,
+        target_size=target_size,
+        use_text_layer=use_text_layer,
+    )
 
-                # For the last split, extend to the bottom of the image
-                if i == num_splits - 1:
-                    y_end = image.height
+    # This generator runs in the producer thread of extract_text_from_pdf while
+    # consumer threads are already live, and forking a multi-threaded process
+    # can deadlock the child, so workers are spawned instead
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_render_worker,
+        initargs=(pdf_path,),
+    ) as executor:
+        pending = deque()
+        pages = iter(range(page_count))
+
+        # Keep a bounded window of pages in flight and yield them in page order
+        for page_num in islice(pages, workers * 2):
+            pending.append(executor.submit(render, page_num))
+
+        while pending:
+            jobs = pending.popleft().result()
+            page_num = next(pages, None)
+            if page_num is not None:
+                pending.append(executor.submit(render, page_num))
+            yield from jobs
 
-                # Crop the image section
-                cropped = image.crop((0, y_start, image.width, y_end))
-                images.append(cropped)
-        else:
-            images.append(image)
 
-    doc.close()
-    return images
+def image_to_base64(image):
+    """Convert JPEG encoded image bytes to base64 string"""
+    # Encodes straight into the result string, no intermediate bytes to decode
+    return pybase64.b64encode_as_string(image)
 
 
-def image_to_base64(image):
-    """Convert PIL Image to base64 string"""
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
+def hash_lines(lines):
+    """Hash each line once, ignoring case and surrounding whitespace"""
+    return np.array([hash(line.lower().strip()) for line in lines], dtype=np.int64)
+
+
+def remove_overlap(previous_text, current_text, similarity_threshold=0.7):
+    """Remove the start of current_text that repeats the end of previous_text
 
+    Each way of aligning the first lines of the current section with the last
+    lines of the previous one is a candidate. Lines strictly inside the
+    alignment must have equal hashes. The two boundary lines may have been cut
+    at the tile seam, so each of them is compared with SequenceMatcher instead.
+    """
+    current_text = current_text.strip()
+
+    # Split into lines for better comparison
+    current_lines = current_text.split("\n")
+    current_hashes = hash_lines(current_lines[:10])  # Check first 10 lines
+    previous_tail = previous_text.strip().split("\n")[-15:]
+    previous_hashes = hash_lines(previous_tail)
+
+    def similar(previous_line, current_line):
+        return (
+            SequenceMatcher(
+                None, previous_line.lower().strip(), current_line.lower().strip()
+            ).ratio()
+            > similarity_threshold
+        )
 
-def remove_overlapping_text(texts, similarity_threshold=0.7):
-    """Remove overlapping text between consecutive page sections"""
-    if len(texts) <= 1:
-        return texts
+    # Earlier starts in the previous tail give longer overlaps, so try them first
+    for start in range(len(previous_tail)):
+        length = len(previous_tail) - start
+        if length > len(current_hashes):
+            continue
+        if length > 2 and not np.array_equal(
+            previous_hashes[start + 1 : -1], current_hashes[1 : length - 1]
+        ):
+            continue
 
-    cleaned_texts = [texts[0]]  # Keep first text as-is
+        if similar(previous_tail[start], current_lines[0]) and similar(
+            previous_tail[-1], current_lines[length - 1]
+        ):
+            # Remove overlapping part from current text
+            return "\n".join(current_lines[length:])
 
-    for i in range(1, len(texts)):
-        current_text = texts[i].strip()
-        previous_text = cleaned_texts[-1].strip()
+    return current_text
 
-        # Split into lines for better comparison
-        current_lines = current_text.split("\n")
-        previous_lines = previous_text.split("\n")
 
-        # Find overlapping content at the beginning of current text
-        best_match_end = 0
-        for j in range(min(10, len(current_lines))):  # Check first 10 lines
-            current_segment = "\n".join(current_lines[: j + 1])
+def create_client(parallel=1, host=None):
+    """Create an Ollama client whose connection pool fits the parallel requests
 
-            # Check if this segment appears in the previous text
-            for k in range(max(0, len(previous_lines) - 15), len(previous_lines)):
-                previous_segment = "\n".join(previous_lines[k:])
-                similarity = SequenceMatcher(
-                    None, current_segment.lower(), previous_segment.lower()
-                ).ratio()
+    The host defaults to the OLLAMA_HOST environment variable, then to the
+    local server.
+    """
+    connections = max(parallel, 1) * 2
+    return ollama.Client(
+        host=host,
+        limits=httpx.Limits(
+            max_connections=connections, max_keepalive_connections=connections
+        ),
+    )
+
+
+EXTRACT_PROMPT = "Extract all the text from this document page. Maintain the original formatting and structure as much as possible. Only return the extracted text, no additional commentary."
+
+PAGE_SEPARATOR = "===PAGE==="
+
+BATCH_EXTRACT_PROMPT = (
+    "Extract all the text from each of these document page images, in the order "
+    "they are given. Maintain the original formatting and structure as much as "
+    "possible. Return one section per image, separated by a line containing only "
+    f"{PAGE_SEPARATOR}. Only return the extracted text, no additional commentary."
+)
+
+
+# Message and options shared by every request, built once instead of per tile
+EXTRACT_MESSAGE = {"role": "user", "content": EXTRACT_PROMPT}
+
+BATCH_EXTRACT_MESSAGE = {"role": "user", "content": BATCH_EXTRACT_PROMPT}
+
+CHAT_OPTIONS = {
+    "temperature": 0.1,  # Lower temperature
+    "top_p": 0.8,  # Reduce randomness
+    "top_k": 10,  # Limit token choices
+    "repeat_penalty": 1.2,  # Penalize repetition
+    # "num_predict": 1500,  # Limit output length
+    # "stop": ["---", "END"],  # Stop tokens
+}
+
+# Context reserved per image of a batch, covering the image tokens of a
+# TARGET_TILE_SIZE tile plus its extracted text. Ollama reloads the model when
+# num_ctx changes, so a run sends the same value on every request.
+BATCH_CONTEXT_PER_IMAGE = 4096
 
-                if similarity > similarity_threshold:
-                    best_match_end = j + 1
-                    break
 
-        # Remove overlapping part from current text
-        if best_match_end > 0:
-            cleaned_current = "\n".join(current_lines[best_match_end:])
-        else:
-            cleaned_current = current_text
+def chat(
+    client,
+    message,
+    images_base64,
+    model="qwen2.5vl:7b",
+    stream=False,
+    options=CHAT_OPTIONS,
+):
+    """Send base64 encoded images with a message to Qwen2.5-VL and return the reply"""
+    response = client.chat(
+        model=model,
+        messages=[{**message, "images": images_base64}],
+        stream=stream,
+        options=options,
+    )
+
+    if not stream:
+        return response["message"]["content"].strip()
+
+    page_text = ""
+    for chunk in response:
+        if chunk["message"]["content"]:
+            page_text += chunk["message"]["content"]
+            print(chunk["message"]["content"], end="", flush=True)
+
+    print()  # New line after streaming is complete
+
+    return page_text.strip()
+
+
+def extract_page_text(
+    client, image_base64, model="qwen2.5vl:7b", stream=False, options=CHAT_OPTIONS
+):
+    """Send a single base64 encoded image to Qwen2.5-VL and return its text"""
+    return chat(client, EXTRACT_MESSAGE, [image_base64], model, stream, options)
+
+
+def extract_batch_text(
+    client, images_base64, model="qwen2.5vl:7b", stream=False, options=CHAT_OPTIONS
+):
+    """Extract the text of several images with a single request
+
+    Falls back to one request per image when the reply doesn't contain exactly
+    one section per image.
+    """
+    if len(images_base64) == 1:
+        return [extract_page_text(client, images_base64[0], model, stream, options)]
+
+    reply = chat(client, BATCH_EXTRACT_MESSAGE, images_base64, model, stream, options)
+    sections = [section.strip() for section in reply.split(PAGE_SEPARATOR)]
+    if len(sections) == len(images_base64):
+        return sections
+
+    print(
+        f"Expected {len(images_base64)} sections but got {len(sections)}, "
+        "extracting pages one by one"
+    )
+    return [
+        extract_page_text(client, image_base64, model, stream, options)
+        for image_base64 in images_base64
+    ]
+
+
+def cache_path(cache_dir, image_base64, model, options=CHAT_OPTIONS):
+    """Path of the cached text for an image
+
+    The key covers the model, both prompts the image may be sent with, the
+    request options (whose num_ctx follows the batch size) and the pixels, so
+    changing any of them never reuses stale results.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model.encode())
+    digest.update(EXTRACT_PROMPT.encode())
+    digest.update(BATCH_EXTRACT_PROMPT.encode())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    digest.update(image_base64.encode())
+    return os.path.join(cache_dir, f"{digest.hexdigest()}.txt")
+
+
+def read_cached_text(path):
+    """Return the cached text at path, or None if it hasn't been cached yet"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_cached_text(path, text):
+    """Write text to the cache atomically so a crash never leaves a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def extract_cached_batch_text(
+    client,
+    images_base64,
+    model="qwen2.5vl:7b",
+    stream=False,
+    options=CHAT_OPTIONS,
+    cache_dir=None,
+):
+    """Like extract_batch_text, but reuse results cached in cache_dir
+
+    Only the images missing from the cache are sent to the model, and their
+    results are cached for the next run.
+    """
+    if cache_dir is None:
+        return extract_batch_text(client, images_base64, model, stream, options)
 
-        cleaned_texts.append(cleaned_current)
+    paths = [cache_path(cache_dir, image, model, options) for image in images_base64]
+    texts = [read_cached_text(path) for path in paths]
+    missing = [j for j, text in enumerate(texts) if text is None]
 
-    return cleaned_texts
+    if missing:
+        extracted = extract_batch_text(
+            client, [images_base64[j] for j in missing], model, stream, options
+        )
+        for j, text in zip(missing, extracted):
+            write_cached_text(paths[j], text)
+            texts[j] = text
+
+    return texts
+
+
+def group_jobs(jobs, batch_size):
+    """Group consecutive image jobs into batches of up to batch_size
+
+    Yields (kind, jobs) pairs in order. Text jobs are always yielded on their
+    own, and they end the image batch before them.
+    """
+    batch = []
+    for job in jobs:
+        if job[0] == "text":
+            if batch:
+                yield "image", batch
+                batch = []
+            yield "text", [job]
+            continue
+
+        batch.append(job)
+        if len(batch) == batch_size:
+            yield "image", batch
+            batch = []
+
+    if batch:
+        yield "image", batch
 
 
 def extract_text_from_pdf(
@@ -108,53 +468,151 @@ def extract_text_from_pdf(
     stream=False,
     num_splits=4,
     overlap_ratio=0.1,
+    parallel=1,
+    hosts=None,
+    batch_size=1,
+    cache_dir=None,
+    write=None,
+    use_text_layer=True,
 ):
-    """Extract text from PDF using Qwen2.5-VL via Ollama"""
-    images = pdf_to_images(pdf_path, num_splits=num_splits, overlap_ratio=overlap_ratio)
-    extracted_text = []
-
-    for i, image in enumerate(images):
-        print(f"Processing page {i + 1}/{len(images)}...")
-
-        # Convert image to base64
-        img_base64 = image_to_base64(image)
-
-        print("Extracting text from page", i + 1)
-        response = ollama.chat(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": "Extract all the text from this document page. Maintain the original formatting and structure as much as possible. Only return the extracted text, no additional commentary.",
-                    "images": [img_base64],
-                }
-            ],
-            stream=stream,
-            options={
-                "temperature": 0.1,  # Lower temperature
-                "top_p": 0.8,  # Reduce randomness
-                "top_k": 10,  # Limit token choices
-                "repeat_penalty": 1.2,  # Penalize repetition
-                # "num_predict": 1500,  # Limit output length
-                # "stop": ["---", "END"],  # Stop tokens
-            },
-        )
+    """Extract text from PDF using Qwen2.5-VL via Ollama
+
+    Args:
+        parallel: Number of requests kept in flight against Ollama. Should match
+            the server's OLLAMA_NUM_PARALLEL setting. Streaming is only used
+            when this is 1, since chunks of concurrent requests would interleave.
+        hosts: Ollama servers to spread pages across in round-robin order, e.g.
+            one per GPU. Defaults to the single server from OLLAMA_HOST.
+        batch_size: Number of pages sent together in a single request
+        cache_dir: Directory where extracted text is cached per page, so an
+            interrupted run can be resumed without repeating finished pages
+        write: Called with each piece of the output as soon as its page is
+            done, in page order. When omitted the whole text is returned instead
+        use_text_layer: Take the text of pages that already have a usable text
+            layer straight from the PDF, without calling the model
+    """
+    with fitz.open(pdf_path) as doc:
+        total = doc.page_count
+    jobs = pdf_to_jobs(
+        pdf_path,
+        num_splits=num_splits,
+        overlap_ratio=overlap_ratio,
+        use_text_layer=use_text_layer,
+        page_count=total,
+    )
+    batch_size = max(batch_size, 1)
+    # Size the context to a full batch once, so every request uses the same num_ctx
+    options = {**CHAT_OPTIONS, "num_ctx": BATCH_CONTEXT_PER_IMAGE * batch_size}
+    # One client per host for the whole run so connections are reused between pages
+    clients = [create_client(parallel, host) for host in hosts or [None]]
+    consumers = max(parallel, 1)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Rendering and encoding run in a producer thread while the consumers wait
+    # on Ollama. The bounded queue keeps the producer at most a few batches ahead.
+    work = queue.Queue(maxsize=2 * consumers)
+    results = {}
+    errors = []
+
+    output = None
+    if write is None:
+        output = []
+        write = output.append
+
+    # Batches finish out of order, so finished ones wait in results until every
+    # batch before them has been written. Only the last section is kept for the
+    # overlap comparison.
+    results_lock = threading.Lock()
+    # Page numbers of text-layer results, announced when they are written so
+    # the message never lands in the middle of a streamed reply
+    text_layer_pages = {}
+    next_batch = 0
+    previous_text = None
+    separator = ""
+
+    def write_ready():
+        nonlocal next_batch, previous_text, separator
+        while next_batch in results:
+            if next_batch in text_layer_pages:
+                page = text_layer_pages.pop(next_batch)
+                print(f"Using the text layer of page {page}/{total}")
+
+            for text in results.pop(next_batch):
+                if previous_text is not None:
+                    # Remove overlapping text between sections
+                    text = remove_overlap(previous_text, text)
+                previous_text = text
+
+                # Join all text without page markers
+                if text.strip():
+                    write(separator + text.strip())
+                    separator = "\n\n"
+            next_batch += 1
+
+    def produce():
+        # Text groups never reach a consumer, so image batches get their own
+        # counter to keep the round-robin over hosts even on mixed PDFs
+        image_batches = 0
+        try:
+            for i, (kind, group) in enumerate(group_jobs(jobs, batch_size)):
+                if errors:
+                    break
 
-        page_text = ""
-        for chunk in response:
-            if chunk["message"]["content"]:
-                page_text += chunk["message"]["content"]
-                print(chunk["message"]["content"], end="", flush=True)
+                pages = [page_num + 1 for _, page_num, _ in group]
+                if kind == "text":
+                    with results_lock:
+                        text_layer_pages[i] = pages[0]
+                        results[i] = [group[0][2]]
+                        write_ready()
+                else:
+                    images_base64 = [image_to_base64(image) for _, _, image in group]
+                    client = clients[image_batches % len(clients)]
+                    image_batches += 1
+                    work.put((i, client, pages, images_base64))
+        except Exception as error:
+            errors.append(error)
+        finally:
+            for _ in range(consumers):
+                work.put(None)
+
+    def consume(stream):
+        while (item := work.get()) is not None:
+            i, client, pages, images_base64 = item
+            if errors:
+                continue  # Keep draining so the producer is never blocked
+
+            start, end = pages[0], pages[-1]
+            label = f"page {start}" if start == end else f"pages {start}-{end}"
+            print(f"Extracting text from {label}/{total}...")
+
+            try:
+                texts = extract_cached_batch_text(
+                    client, images_base64, model, stream, options, cache_dir
+                )
+                with results_lock:
+                    results[i] = texts
+                    write_ready()
+            except Exception as error:
+                errors.append(error)
 
-        print()  # New line after streaming is complete
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
 
-        extracted_text.append(page_text.strip())
+    if consumers == 1:
+        consume(stream)
+    else:
+        print(f"Processing {total} pages with {consumers} parallel requests...")
+        with ThreadPoolExecutor(max_workers=consumers) as executor:
+            for _ in range(consumers):
+                executor.submit(consume, False)
 
-    # Remove overlapping text between sections
-    cleaned_texts = remove_overlapping_text(extracted_text)
+    producer.join()
+    if errors:
+        raise errors[0]
 
-    # Join all text without page markers
-    return "\n\n".join(text.strip() for text in cleaned_texts if text.strip())
+    if output is not None:
+        return "".join(output)
 
 
 def main():
@@ -174,21 +632,75 @@ def main():
     parser.add_argument(
         "--stream", type=bool, default=True, help="Enable streaming output"
     )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Number of concurrent Ollama requests (match OLLAMA_NUM_PARALLEL)",
+    )
+    parser.add_argument(
+        "--hosts",
+        type=lambda value: [host.strip() for host in value.split(",") if host.strip()],
+        default=None,
+        help="Comma separated Ollama hosts to spread pages across",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Number of pages sent to the model in a single request",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        default=None,
+        help="Directory to cache extracted pages in, to resume interrupted runs",
+    )
+    parser.add_argument(
+        "--ignore_text_layer",
+        action="store_true",
+        help="Send every page to the model, even pages that already contain text",
+    )
 
     args = parser.parse_args()
 
-    extracted_text = extract_text_from_pdf(
-        args.pdf_path,
-        model=args.model,
-        stream=args.stream,
-        num_splits=args.num_splits,
-        overlap_ratio=args.overlap_ratio,
-    )
-
-    # Save to markdown file
+    # Save to markdown file as pages are extracted. The text goes to a partial
+    # file that is only opened once there is something to write and only
+    # replaces the output when the whole PDF is done, so a bad path or a failed
+    # run never clobbers a previous result.
     output_path = args.pdf_path.rsplit(".", 1)[0] + "_extracted.md"
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(extracted_text)
+    partial_path = output_path + ".partial"
+    output = None
+
+    def write(text):
+        nonlocal output
+        if output is None:
+            output = open(partial_path, "w", encoding="utf-8")
+        output.write(text)
+
+    try:
+        extract_text_from_pdf(
+            args.pdf_path,
+            model=args.model,
+            stream=args.stream,
+            num_splits=args.num_splits,
+            overlap_ratio=args.overlap_ratio,
+            parallel=args.parallel,
+            hosts=args.hosts,
+            batch_size=args.batch_size,
+            cache_dir=args.cache_dir,
+            write=write,
+            use_text_layer=not args.ignore_text_layer,
+        )
+    except BaseException:
+        if output is not None:
+            output.close()
+            os.remove(partial_path)
+        raise
+
+    if output is None:
+        write("")  # No text was extracted, still produce an empty output
+    output.close()
+    os.replace(partial_path, output_path)
 
     print(f"Text extraction complete! Check '{output_path}' for results.")
 